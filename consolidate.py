@@ -9,10 +9,18 @@ a single text file for easy sharing or backup purposes.
 USAGE:
     python consolidate.py
 
+    Batch mode (back up many projects at once, in parallel):
+    python consolidate.py --batch ~/projects/* --output-dir backups
+    python consolidate.py --batch --roots-file roots.txt --output-dir backups --jobs 4
+
 OUTPUT:
     Creates a file named 'project_backup.txt' in the current directory
     containing all your project files with clear separators.
 
+    In batch mode, writes one '<project>.project_backup.txt' per project root
+    into the output directory, plus 'batch_summary.txt' with per-root timings
+    and any failures.
+
 HOW IT WORKS:
     1. Scans the current directory and all subdirectories
     2. Filters out unnecessary files (git files, cache, etc.)
@@ -20,7 +28,13 @@ HOW IT WORKS:
     4. Creates a table of contents at the beginning
 """
 
+import argparse
+import glob
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from datetime import datetime
 
@@ -46,6 +60,10 @@ EXCLUDED_FILES = {
     'project_backup.txt', # Don't include previous backups
 }
 
+# Name of the report written next to the backups in batch mode
+BATCH_SUMMARY_FILENAME = 'batch_summary.txt'
+
+
 # File extensions that should be treated as binary and skipped
 BINARY_EXTENSIONS = {
     '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.svg',  # Images
@@ -84,29 +102,40 @@ def should_exclude_file(file_path):
     return False
 
 
-def get_all_files(root_dir):
+def get_all_files(root_dir, skip_dir=None):
     """
     Recursively find all files in the project directory.
     
     Args:
         root_dir: Path object representing the root directory to scan
+        skip_dir: Optional directory to leave out entirely (e.g. where
+                  batch backups are being written)
         
     Returns:
         List of Path objects for all files that should be included
     """
     all_files = []
+    skip_dir = skip_dir.resolve() if skip_dir else None
     
-    # Walk through all directories and files
-    for item in root_dir.rglob('*'):
-        # Skip directories, we only want files
-        if item.is_dir():
-            continue
-        
-        # Skip excluded files
-        if should_exclude_file(item):
-            continue
+    # Walk through all directories and files. Excluded directories are
+    # pruned here so we never descend into node_modules, .git, etc.
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        current = Path(dirpath)
+        dirnames[:] = [
+            d for d in dirnames
+            if d not in EXCLUDED_DIRS
+            and (skip_dir is None or (current / d).resolve() != skip_dir)
+        ]
         
-        all_files.append(item)
+        for filename in filenames:
+            item = current / filename
+            
+            # Skip excluded files (checked relative to the project root, so
+            # folders *above* the project never cause files to be skipped)
+            if should_exclude_file(item.relative_to(root_dir)):
+                continue
+            
+            all_files.append(item)
     
     # Sort files for consistent output
     all_files.sort()
@@ -141,27 +170,39 @@ def read_file_safely(file_path):
     return False, "[Binary or unreadable file - skipped]"
 
 
-def create_consolidated_file(output_filename='project_backup.txt'):
+def create_consolidated_file(output_filename='project_backup.txt', root_dir=None, quiet=False):
     """
     Main function to create the consolidated backup file.
     
     Args:
-        output_filename: Name of the output file (default: project_backup.txt)
+        output_filename: Name or path of the output file (default: project_backup.txt)
+        root_dir: Directory to back up (default: the current directory)
+        quiet: If True, don't print progress (used by batch mode, where many
+               projects run at once and their output would interleave)
+        
+    Returns:
+        Dictionary with 'successful', 'skipped' and 'total' file counts
     """
-    print("=" * 70)
-    print("FILE CONSOLIDATOR - Replit Project Backup Tool")
-    print("=" * 70)
-    print()
+    # In quiet mode, swallow all progress messages
+    log = (lambda *args, **kwargs: None) if quiet else print
     
-    # Get the current directory
-    root_dir = Path.cwd()
-    print(f"📁 Scanning directory: {root_dir}")
-    print()
+    log("=" * 70)
+    log("FILE CONSOLIDATOR - Replit Project Backup Tool")
+    log("=" * 70)
+    log()
     
-    # Find all files to include
-    files_to_process = get_all_files(root_dir)
-    print(f"✓ Found {len(files_to_process)} files to consolidate")
-    print()
+    # Default to the current directory
+    root_dir = Path(root_dir) if root_dir else Path.cwd()
+    log(f"📁 Scanning directory: {root_dir}")
+    log()
+    
+    # Find all files to include (never the folder the backup is written to,
+    # if that happens to be inside the project)
+    output_dir = Path(output_filename).parent
+    skip_dir = output_dir if output_dir.resolve() != root_dir.resolve() else None
+    files_to_process = get_all_files(root_dir, skip_dir=skip_dir)
+    log(f"✓ Found {len(files_to_process)} files to consolidate")
+    log()
     
     # Create the output file
     with open(output_filename, 'w', encoding='utf-8') as output:
@@ -190,7 +231,7 @@ def create_consolidated_file(output_filename='project_backup.txt'):
         for idx, file_path in enumerate(files_to_process, 1):
             rel_path = file_path.relative_to(root_dir)
             
-            print(f"Processing [{idx}/{len(files_to_process)}]: {rel_path}")
+            log(f"Processing [{idx}/{len(files_to_process)}]: {rel_path}")
             
             # Write file header
             output.write("\n" + "=" * 70 + "\n")
@@ -227,19 +268,367 @@ def create_consolidated_file(output_filename='project_backup.txt'):
         output.write(f"Skipped: {skipped} files\n")
         output.write(f"Total: {len(files_to_process)} files\n")
     
-    print()
+    log()
+    log("=" * 70)
+    log("✅ CONSOLIDATION COMPLETE!")
+    log("=" * 70)
+    log(f"📄 Output file: {output_filename}")
+    log(f"✓ Successfully processed: {successful} files")
+    log(f"⚠ Skipped: {skipped} files")
+    log(f"📊 Total: {len(files_to_process)} files")
+    log()
+    log(f"You can now share or backup the file: {output_filename}")
+    log()
+    
+    return {
+        'successful': successful,
+        'skipped': skipped,
+        'total': len(files_to_process),
+    }
+
+
+def expand_roots(patterns, roots_file=None, output_dir=None):
+    """
+    Turn the project roots given on the command line into a list of folders.
+    
+    Args:
+        patterns: Paths or glob patterns (e.g. '~/projects/*')
+        roots_file: Optional text file with one path or pattern per line
+                    (blank lines and lines starting with '#' are ignored)
+        output_dir: Where the backups are written. It (and anything inside
+                    it) is never treated as a project, otherwise a glob like
+                    '~/projects/*' would back up last night's backups.
+        
+    Returns:
+        Sorted list of unique Path objects for existing directories
+    """
+    patterns = list(patterns)
+    
+    if roots_file:
+        with open(roots_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    patterns.append(line)
+    
+    output_dir = Path(output_dir).resolve() if output_dir else None
+    
+    roots = set()
+    for pattern in patterns:
+        pattern = os.path.expanduser(pattern)
+        # A pattern that matches nothing is kept as-is so it shows up as a
+        # failure in the summary instead of silently disappearing
+        matches = glob.glob(pattern) or [pattern]
+        found_dir = False
+        for match in matches:
+            path = Path(match).resolve()
+            if path.exists() and not path.is_dir():
+                continue
+            found_dir = True
+            if output_dir and (path == output_dir or output_dir in path.parents):
+                print(f"⚠ Skipping output directory: {path}")
+                continue
+            roots.add(path)
+        
+        # Let the user know when a pattern only matched files
+        if not found_dir:
+            print(f"⚠ Pattern matched only files, no project folders: {pattern}")
+    
+    return sorted(roots)
+
+
+def backup_output_paths(roots, output_dir):
+    """
+    Pick a backup file name for every project root.
+    
+    Projects with the same folder name (e.g. two checkouts both called 'app')
+    get a numeric suffix so they don't overwrite each other.
+    
+    Args:
+        roots: List of project root Paths
+        output_dir: Path of the directory the backups go into
+        
+    Returns:
+        Dictionary mapping each root to its backup file Path
+    """
+    outputs = {}
+    used = set()
+    
+    for root in roots:
+        base = root.name or 'root'
+        name = f"{base}.project_backup.txt"
+        counter = 2
+        while name in used:
+            name = f"{base}-{counter}.project_backup.txt"
+            counter += 1
+        used.add(name)
+        outputs[root] = output_dir / name
+    
+    return outputs
+
+
+def backup_one_root(root_dir, output_path):
+    """
+    Back up a single project. Runs inside a worker process in batch mode.
+    
+    Args:
+        root_dir: Path of the project to back up
+        output_path: Path of the backup file to write
+        
+    Returns:
+        Dictionary describing the result (status, counts, timing, error)
+    """
+    started = time.perf_counter()
+    result = {
+        'root': str(root_dir),
+        'output': str(output_path),
+        'status': 'ok',
+        'files': 0,
+        'skipped': 0,
+        'error': '',
+    }
+    
+    try:
+        if not Path(root_dir).is_dir():
+            raise FileNotFoundError(f"Not a directory: {root_dir}")
+        counts = create_consolidated_file(output_path, root_dir=root_dir, quiet=True)
+        result['files'] = counts['total']
+        result['skipped'] = counts['skipped']
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = f"{type(e).__name__}: {e}"
+    
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def backup_in_own_process(root_dir, output_path):
+    """
+    Back up one project in a fresh, single-use worker process.
+    
+    Used to retry projects after a worker died, so a project that crashes
+    its worker again can't take any other project down with it.
+    
+    Args:
+        root_dir: Path of the project to back up
+        output_path: Path of the backup file to write
+        
+    Returns:
+        Result dictionary, marked failed if the worker died again
+    """
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            return pool.submit(backup_one_root, root_dir, output_path).result()
+    except Exception as e:
+        return failed_result(root_dir, output_path, e, started)
+
+
+def failed_result(root_dir, output_path, error, started):
+    """
+    Build the result for a project whose worker never returned one.
+    
+    Args:
+        root_dir: Path of the project
+        output_path: Path its backup would have been written to
+        error: The exception explaining what went wrong
+        started: perf_counter() value from when the project was submitted
+        
+    Returns:
+        Result dictionary in the same shape as backup_one_root's
+    """
+    return {
+        'root': str(root_dir),
+        'output': str(output_path),
+        'status': 'failed',
+        'files': 0,
+        'skipped': 0,
+        'error': f"{type(error).__name__}: {error}",
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def write_batch_summary(results, summary_path, total_seconds, jobs):
+    """
+    Write the batch report: one line per project plus any failures.
+    
+    Args:
+        results: List of result dictionaries from backup_one_root
+        summary_path: Path of the report file to write
+        total_seconds: Wall-clock time for the whole batch
+        jobs: Number of worker processes that were used
+    """
+    failed = [r for r in results if r['status'] != 'ok']
+    
+    with open(summary_path, 'w', encoding='utf-8') as output:
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        output.write("=" * 70 + "\n")
+        output.write("BATCH BACKUP SUMMARY\n")
+        output.write("=" * 70 + "\n")
+        output.write(f"Created: {timestamp}\n")
+        output.write(f"Projects: {len(results)}\n")
+        output.write(f"Failed: {len(failed)}\n")
+        output.write(f"Workers: {jobs}\n")
+        output.write(f"Total time: {total_seconds:.2f}s\n")
+        output.write("=" * 70 + "\n\n")
+        
+        output.write(f"{'STATUS':<8} {'SECONDS':>8} {'FILES':>7}  ROOT\n")
+        output.write("-" * 70 + "\n")
+        for r in results:
+            output.write(f"{r['status']:<8} {r['seconds']:>8.2f} {r['files']:>7}  {r['root']}\n")
+        
+        if failed:
+            output.write("\nFAILURES\n")
+            output.write("-" * 70 + "\n")
+            for r in failed:
+                output.write(f"{r['root']}\n    {r['error']}\n")
+
+
+def run_batch(roots, output_dir, jobs=None):
+    """
+    Back up many projects in parallel, one backup file per project.
+    
+    Projects are spread across a pool of worker processes. 'jobs' caps how
+    many projects are being read and written at the same time, which is
+    also the knob to turn down if the disk (rather than the CPU) is the
+    bottleneck.
+    
+    Args:
+        roots: List of project root Paths
+        output_dir: Directory to write the backups and the summary into
+        jobs: Maximum number of projects processed at once
+              (default: number of CPUs)
+        
+    Returns:
+        List of result dictionaries, in the same order as 'roots'
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(roots) or 1))
+    outputs = backup_output_paths(roots, output_dir)
+    
     print("=" * 70)
-    print("✅ CONSOLIDATION COMPLETE!")
+    print("FILE CONSOLIDATOR - Batch Backup")
     print("=" * 70)
-    print(f"📄 Output file: {output_filename}")
-    print(f"✓ Successfully processed: {successful} files")
-    print(f"⚠ Skipped: {skipped} files")
-    print(f"📊 Total: {len(files_to_process)} files")
+    print(f"📁 Projects: {len(roots)}")
+    print(f"⚙ Workers: {jobs}")
+    print(f"📄 Output directory: {output_dir}")
+    print()
+    
+    started = time.perf_counter()
+    results = {}
+    submitted = {}
+    summary_path = output_dir / BATCH_SUMMARY_FILENAME
+    
+    def report(root, result):
+        results[root] = result
+        mark = "✓" if result['status'] == 'ok' else "✗"
+        print(f"{mark} [{len(results)}/{len(roots)}] {result['root']} ({result['seconds']:.2f}s)")
+    
+    try:
+        broken = []
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {
+                pool.submit(backup_one_root, root, outputs[root]): root
+                for root in roots
+            }
+            submitted = {root: time.perf_counter() for root in roots}
+            for future in as_completed(futures):
+                root = futures[future]
+                try:
+                    report(root, future.result())
+                except BrokenProcessPool:
+                    # A worker died (e.g. killed for using too much memory),
+                    # which takes every unfinished project down with it
+                    broken.append(root)
+                except Exception as e:
+                    report(root, failed_result(root, outputs[root], e, submitted[root]))
+        
+        if broken:
+            # Retry those projects one per process, so only the project that
+            # actually kills its worker ends up failed
+            print(f"⚠ A worker process died; retrying {len(broken)} project(s) in isolation")
+            with ThreadPoolExecutor(max_workers=jobs) as threads:
+                retries = {
+                    threads.submit(backup_in_own_process, root, outputs[root]): root
+                    for root in broken
+                }
+                for future in as_completed(retries):
+                    report(retries[future], future.result())
+    finally:
+        # Always write the summary, even if the batch was interrupted, so the
+        # projects that did finish (and the ones that didn't) are on record
+        total_seconds = time.perf_counter() - started
+        for root in roots:
+            if root not in results:
+                error = RuntimeError("Did not complete (batch interrupted)")
+                results[root] = failed_result(root, outputs[root], error, submitted.get(root, started))
+        ordered = [results[root] for root in roots]
+        write_batch_summary(ordered, summary_path, total_seconds, jobs)
+    
+    failed = sum(1 for r in ordered if r['status'] != 'ok')
     print()
-    print(f"You can now share or backup the file: {output_filename}")
+    print("=" * 70)
+    print("✅ BATCH COMPLETE!" if not failed else f"⚠ BATCH COMPLETE WITH {failed} FAILURE(S)")
+    print("=" * 70)
+    print(f"📊 Projects: {len(ordered)}, failed: {failed}, time: {total_seconds:.2f}s")
+    print(f"📄 Summary: {summary_path}")
     print()
+    
+    return ordered
+
+
+def main(argv=None):
+    """
+    Command-line entry point.
+    
+    With no arguments, backs up the current directory exactly as before.
+    With --batch, backs up every given project root in parallel.
+    """
+    parser = argparse.ArgumentParser(
+        description="Combine all files in a project into a single text backup."
+    )
+    parser.add_argument(
+        '--batch',
+        nargs='*',
+        metavar='ROOT',
+        help="Back up many project roots (paths or glob patterns) in parallel.",
+    )
+    parser.add_argument(
+        '--roots-file',
+        help="Text file with one project root or glob pattern per line (batch mode).",
+    )
+    parser.add_argument(
+        '--output-dir',
+        default='backups',
+        help="Where batch backups and the summary are written (default: backups).",
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=None,
+        help="Maximum projects processed at once in batch mode (default: CPU count).",
+    )
+    args = parser.parse_args(argv)
+    
+    if args.batch is None and not args.roots_file:
+        # Run the consolidation for the current directory
+        create_consolidated_file()
+        return 0
+    
+    try:
+        roots = expand_roots(args.batch or [], args.roots_file, output_dir=args.output_dir)
+    except OSError as e:
+        # e.g. a --roots-file that doesn't exist or can't be read
+        print(f"Could not read roots file: {e}")
+        return 1
+    if not roots:
+        print("No project roots matched.")
+        return 1
+    
+    results = run_batch(roots, args.output_dir, jobs=args.jobs)
+    return 1 if any(r['status'] != 'ok' for r in results) else 0
 
 
 if __name__ == "__main__":
-    # Run the consolidation
-    create_consolidated_file()
+    sys.exit(main())
@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from pathlib import Path
+
+from page_weight_budget import CSS_URL_RE, is_external, iter_pages, resolve_local
+from retarget_images_to_webp import decode_text, encode_text, find_repo_root
+
+
+CACHE_FILENAME = ".critical-css-cache.json"
+CACHE_VERSION = 3
+
+DEFAULT_STYLESHEET = "assets/css/styles.css"
+
+REGION_START = "<!-- critical-css:start -->"
+REGION_END = "<!-- critical-css:end -->"
+
+REGION_RE = re.compile(
+    r"(?P<indent>[ \t]*)" + re.escape(REGION_START) + r".*?" + re.escape(REGION_END),
+    re.DOTALL,
+)
+NOSCRIPT_LINK_RE = re.compile(r"<noscript>(?P<link><link\b[^>]*>)</noscript>", re.IGNORECASE)
+LINK_TAG_RE = re.compile(r"(?P<indent>^[ \t]*)?<link\b[^>]*>", re.IGNORECASE | re.MULTILINE)
+ATTR_RE = re.compile(r"([\w:-]+)(?:\s*=\s*(?:\"([^\"]*)\"|'([^']*)'|([^\s>]+)))?")
+TAG_NAME_RE = re.compile(r"^<[\w-]+|/?>$")
+
+# Attributes build_region sets itself on the preload link.
+PRELOAD_OWN_ATTRS = {"rel", "href", "as", "onload"}
+
+# At-rules whose block holds further style rules that can be filtered.
+GROUPING_AT_RULES = {"@media", "@supports", "@layer", "@container", "@document"}
+
+PSEUDO_RE = re.compile(r"::?[\w-]+(?:\((?:[^()]|\([^()]*\))*\))?")
+ATTRIBUTE_SELECTOR_RE = re.compile(r"\[[^\]]*\]")
+COMBINATOR_RE = re.compile(r"\s*[>+~]\s*|\s+")
+TAG_RE = re.compile(r"^[a-zA-Z][\w-]*")
+CLASS_RE = re.compile(r"\.(-?[_a-zA-Z][\w-]*)")
+ID_RE = re.compile(r"#(-?[_a-zA-Z][\w-]*)")
+
+# Elements every page renders even when they never appear as tags in the source.
+IMPLICIT_TAGS = {"html", "head", "body"}
+
+# Classes and elements scripts add at runtime, e.g. classList.add('mobile-open').
+CLASS_LIST_CALL_RE = re.compile(r"classList\.(?:add|remove|toggle|contains|replace)\(([^)]*)\)")
+CLASS_NAME_ASSIGN_RE = re.compile(r"\bclassName\s*\+?=\s*(['\"`])(.*?)\1")
+CREATE_ELEMENT_RE = re.compile(r"createElement\(\s*['\"]([\w-]+)['\"]\s*\)")
+STRING_LITERAL_RE = re.compile(r"(['\"`])(.*?)\1")
+CLASS_NAME_RE = re.compile(r"^-?[_a-zA-Z][\w-]*$")
+
+URL_SUFFIX_RE = re.compile(r"([^?#]*)(.*)", re.DOTALL)
+
+
+@dataclass
+class CssRule:
+    prelude: str
+    body: str | None = None
+    children: list[CssRule] | None = None
+
+    def render(self, inner: list[str] | None = None) -> str:
+        if self.children is not None:
+            if inner is None:
+                inner = [child.render() for child in self.children]
+            joined = "\n".join(inner)
+            return f"{self.prelude} {{\n{joined}\n}}"
+        if self.body is None:
+            return f"{self.prelude};"
+        return f"{self.prelude} {{{self.body}}}"
+
+
+@dataclass
+class PageTokens:
+    tags: set[str] = field(default_factory=lambda: set(IMPLICIT_TAGS))
+    classes: set[str] = field(default_factory=set)
+    ids: set[str] = field(default_factory=set)
+
+    def update(self, other: PageTokens) -> None:
+        self.tags |= other.tags
+        self.classes |= other.classes
+        self.ids |= other.ids
+
+
+def collect_script_tokens(text: str) -> PageTokens:
+    """Classes and elements a script adds to the page at runtime.
+
+    Only string literals are seen; names built from expressions must go on
+    the --safelist.
+    """
+    tokens = PageTokens(tags=set())
+    for call in CLASS_LIST_CALL_RE.finditer(text):
+        for literal in STRING_LITERAL_RE.finditer(call.group(1)):
+            tokens.classes.update(n for n in literal.group(2).split() if CLASS_NAME_RE.match(n))
+    for assign in CLASS_NAME_ASSIGN_RE.finditer(text):
+        tokens.classes.update(n for n in assign.group(2).split() if CLASS_NAME_RE.match(n))
+    tokens.tags.update(tag.lower() for tag in CREATE_ELEMENT_RE.findall(text))
+    return tokens
+
+
+class TokenCollector(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.tokens = PageTokens()
+        self._script_chunks: list[str] | None = None
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.tokens.tags.add(tag.lower())
+        if tag == "script" and not any(name == "src" for name, _ in attrs):
+            self._script_chunks = []
+        for name, value in attrs:
+            if not value:
+                continue
+            if name == "class":
+                self.tokens.classes.update(value.split())
+            elif name == "id":
+                self.tokens.ids.add(value.strip())
+
+    def handle_data(self, data: str) -> None:
+        if self._script_chunks is not None:
+            self._script_chunks.append(data)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "script" and self._script_chunks is not None:
+            self.tokens.update(collect_script_tokens("".join(self._script_chunks)))
+            self._script_chunks = None
+
+
+def collect_tokens(text: str) -> PageTokens:
+    collector = TokenCollector()
+    collector.feed(text)
+    collector.close()
+    return collector.tokens
+
+
+def split_css(text: str) -> list[CssRule]:
+    """Split stylesheet text into top-level rules, recursing into grouping at-rules."""
+    rules: list[CssRule] = []
+    length = len(text)
+    pos = 0
+    start = 0
+    while pos < length:
+        char = text[pos]
+        if text.startswith("/*", pos):
+            end = text.find("*/", pos + 2)
+            pos = length if end < 0 else end + 2
+            continue
+        if char in "\"'":
+            pos = skip_string(text, pos)
+            continue
+        if char == ";":
+            prelude = strip_comments(text[start:pos]).strip()
+            if prelude:
+                rules.append(CssRule(prelude=prelude))
+            pos += 1
+            start = pos
+            continue
+        if char == "{":
+            prelude = strip_comments(text[start:pos]).strip()
+            close = find_block_end(text, pos)
+            body = text[pos + 1:close]
+            keyword = prelude.split(None, 1)[0].lower() if prelude else ""
+            if keyword in GROUPING_AT_RULES:
+                rules.append(CssRule(prelude=prelude, children=split_css(body)))
+            elif prelude:
+                rules.append(CssRule(prelude=prelude, body=body))
+            pos = close + 1
+            start = pos
+            continue
+        if char == "}":
+            # Stray closing brace; drop it rather than desynchronise.
+            pos += 1
+            start = pos
+            continue
+        pos += 1
+    return rules
+
+
+def skip_string(text: str, pos: int) -> int:
+    quote = text[pos]
+    pos += 1
+    while pos < len(text):
+        if text[pos] == "\\":
+            pos += 2
+            continue
+        if text[pos] == quote:
+            return pos + 1
+        pos += 1
+    return pos
+
+
+def find_block_end(text: str, open_pos: int) -> int:
+    depth = 0
+    pos = open_pos
+    while pos < len(text):
+        if text.startswith("/*", pos):
+            end = text.find("*/", pos + 2)
+            pos = len(text) if end < 0 else end + 2
+            continue
+        char = text[pos]
+        if char in "\"'":
+            pos = skip_string(text, pos)
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return pos
+        pos += 1
+    return len(text)
+
+
+def strip_comments(text: str) -> str:
+    return re.sub(r"/\*.*?\*/", "", text, flags=re.DOTALL)
+
+
+def split_selector_list(prelude: str) -> list[str]:
+    selectors: list[str] = []
+    depth = 0
+    current: list[str] = []
+    for char in prelude:
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        if char == "," and depth == 0:
+            selectors.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    selectors.append("".join(current).strip())
+    return [s for s in selectors if s]
+
+
+def selector_matches(selector: str, tokens: PageTokens) -> bool:
+    # Pseudo-classes, pseudo-elements and attribute filters are ignored, so a
+    # selector is kept whenever the elements it names exist on the page.
+    simplified = ATTRIBUTE_SELECTOR_RE.sub("", PSEUDO_RE.sub("", selector))
+    for compound in COMBINATOR_RE.split(simplified.strip()):
+        if not compound:
+            continue
+        tag = TAG_RE.match(compound)
+        if tag and tag.group(0).lower() not in tokens.tags:
+            return False
+        if any(name not in tokens.classes for name in CLASS_RE.findall(compound)):
+            return False
+        if any(name not in tokens.ids for name in ID_RE.findall(compound)):
+            return False
+    return True
+
+
+def filter_rules(rules: list[CssRule], tokens: PageTokens) -> list[str]:
+    kept: list[str] = []
+    for rule in rules:
+        if rule.children is not None:
+            inner = filter_rules(rule.children, tokens)
+            if inner:
+                kept.append(rule.render(inner))
+        elif rule_is_critical(rule, tokens):
+            kept.append(rule.render())
+    return kept
+
+
+def rule_is_critical(rule: CssRule, tokens: PageTokens) -> bool:
+    if rule.prelude.startswith("@"):
+        # @font-face, @keyframes, @charset and friends carry no selectors.
+        return not rule.prelude.lower().startswith("@import")
+    return any(selector_matches(s, tokens) for s in split_selector_list(rule.prelude))
+
+
+def extract_critical_css(rules: list[CssRule], tokens: PageTokens) -> str:
+    return "\n".join(filter_rules(rules, tokens))
+
+
+def rebase_css_urls(css: str, stylesheet_dir: Path, page_dir: Path) -> str:
+    """Rewrite relative url() values so they still resolve once inlined in the page."""
+
+    def repl(match: re.Match[str]) -> str:
+        url = match.group("url").strip()
+        if is_external(url) or url.startswith(("/", "#")):
+            return match.group(0)
+        path, suffix = URL_SUFFIX_RE.match(url).groups()
+        rebased = Path(os.path.relpath(stylesheet_dir / path, page_dir)).as_posix()
+        quote = match.group("q")
+        return f"url({quote}{rebased}{suffix}{quote})"
+
+    return CSS_URL_RE.sub(repl, css)
+
+
+def parse_attrs(tag: str) -> dict[str, str | None]:
+    """Attributes of a start tag, in order; boolean attributes map to None."""
+    attrs: dict[str, str | None] = {}
+    for match in ATTR_RE.finditer(TAG_NAME_RE.sub("", tag.strip())):
+        value = next((g for g in match.groups()[1:] if g is not None), None)
+        attrs[match.group(1).lower()] = None if value is None else html.unescape(value)
+    return attrs
+
+
+def render_attrs(attrs: dict[str, str | None]) -> str:
+    return "".join(
+        f" {name}" if value is None else f" {name}=\"{html.escape(value, quote=True)}\""
+        for name, value in attrs.items()
+    )
+
+
+def restore_page(text: str) -> str:
+    """Undo a previous run by putting the original <link> back in place of the region."""
+
+    def repl(match: re.Match[str]) -> str:
+        link = NOSCRIPT_LINK_RE.search(match.group(0))
+        return match.group("indent") + (link.group("link") if link else "")
+
+    return REGION_RE.sub(repl, text)
+
+
+def build_region(link_tag: str, critical_css: str, indent: str) -> str:
+    attrs = parse_attrs(link_tag)
+    # media, crossorigin, integrity etc. must survive the switch to rel=stylesheet.
+    extra = {name: value for name, value in attrs.items() if name not in PRELOAD_OWN_ATTRS}
+    preload_attrs = {"rel": "preload", "href": attrs["href"] or "", "as": "style", **extra}
+    preload = (
+        f"<link{render_attrs(preload_attrs)} "
+        "onload=\"this.onload=null;this.rel='stylesheet'\">"
+    )
+    return (
+        f"{indent}{REGION_START}\n"
+        f"{indent}<style>\n{critical_css}\n{indent}</style>\n"
+        f"{indent}{preload}\n"
+        f"{indent}<noscript>{link_tag}</noscript>\n"
+        f"{indent}{REGION_END}"
+    )
+
+
+def inline_page(
+    text: str,
+    page: Path,
+    repo_root: Path,
+    stylesheet: Path,
+    rules: list[CssRule],
+    shared_tokens: PageTokens,
+) -> tuple[str, int, list[str]]:
+    """Inline critical CSS for every link to ``stylesheet`` on the page.
+
+    Returns the new text, the inlined byte count and the hrefs of local
+    stylesheet links that point at files which don't exist.
+    """
+    text = restore_page(text)
+    tokens = collect_tokens(text)
+    tokens.update(shared_tokens)
+
+    critical_css: str | None = None
+    inlined_bytes = 0
+    missing: list[str] = []
+
+    def repl(match: re.Match[str]) -> str:
+        nonlocal critical_css, inlined_bytes
+        link_tag = match.group(0)[len(match.group("indent") or ""):]
+        attrs = parse_attrs(link_tag)
+        href = attrs.get("href") or ""
+        if "stylesheet" not in (attrs.get("rel") or "").lower().split() or not href or is_external(href):
+            return match.group(0)
+        target = resolve_local(href, page.parent, repo_root)
+        if target != stylesheet:
+            if not target.is_file():
+                missing.append(href)
+            return match.group(0)
+        media = (attrs.get("media") or "").strip()
+        if media.lower() == "print":
+            # Print sheets never block rendering; nothing to gain.
+            return match.group(0)
+        if critical_css is None:
+            critical_css = rebase_css_urls(
+                extract_critical_css(rules, tokens), stylesheet.parent, page.parent
+            )
+        css = critical_css
+        if css and media and media.lower() != "all":
+            # The inlined rules must apply under the same conditions the link did.
+            css = f"@media {media} {{\n{css}\n}}"
+        inlined_bytes += len(css.encode("utf-8"))
+        return build_region(link_tag, css, match.group("indent") or "")
+
+    new_text = LINK_TAG_RE.sub(repl, text)
+    return new_text, inlined_bytes, missing
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def load_cache(path: Path) -> dict[str, dict]:
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if payload.get("version") != CACHE_VERSION:
+        return {}
+    return payload.get("pages", {})
+
+
+def save_cache(path: Path, pages: dict[str, dict]) -> None:
+    payload = {"version": CACHE_VERSION, "pages": pages}
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(payload, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Inline the stylesheet rules each page actually uses in a <style> block and "
+            "load the full stylesheet asynchronously. Pages are only reprocessed when "
+            "the page or the stylesheet changed since the last run."
+        )
+    )
+    parser.add_argument(
+        "--stylesheet",
+        default=DEFAULT_STYLESHEET,
+        help=f"Repo-relative stylesheet to split (default: {DEFAULT_STYLESHEET}).",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print a summary but do not write any changes.",
+    )
+    parser.add_argument(
+        "--safelist",
+        action="append",
+        default=[],
+        help=(
+            "Class names (comma- or space-separated, repeatable) to always treat as "
+            "present, for classes scripts build dynamically."
+        ),
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help=f"Ignore {CACHE_FILENAME} and reprocess every page.",
+    )
+    args = parser.parse_args(argv)
+
+    repo_root = find_repo_root(Path(__file__).parent)
+    stylesheet = (repo_root / args.stylesheet).resolve()
+    if not stylesheet.is_file():
+        print(f"Stylesheet not found: {args.stylesheet}")
+        return 1
+
+    css_bytes = stylesheet.read_bytes()
+    css_text, _ = decode_text(css_bytes)
+    rules = split_css(css_text)
+
+    # Markup injected at runtime (e.g. the site header) and classes scripts
+    # toggle are styled on every page, so a change to any of them invalidates
+    # every page just like a stylesheet change.
+    shared_tokens = PageTokens()
+    inputs_hash = hashlib.sha256(css_bytes)
+    for partial in sorted((repo_root / "partials").glob("*.html")):
+        partial_bytes = partial.read_bytes()
+        inputs_hash.update(partial_bytes)
+        shared_tokens.update(collect_tokens(decode_text(partial_bytes)[0]))
+    for script in sorted((repo_root / "assets" / "js").glob("*.js")):
+        script_bytes = script.read_bytes()
+        inputs_hash.update(script_bytes)
+        shared_tokens.update(collect_script_tokens(decode_text(script_bytes)[0]))
+    safelist = sorted({name for value in args.safelist for name in re.split(r"[\s,]+", value) if name})
+    inputs_hash.update("\0".join(safelist).encode("utf-8"))
+    shared_tokens.classes.update(safelist)
+    css_hash = inputs_hash.hexdigest()
+
+    cache_path = repo_root / CACHE_FILENAME
+    cache = {} if args.force else load_cache(cache_path)
+    new_cache: dict[str, dict] = {}
+
+    per_page: dict[str, int] = {}
+    warnings: list[str] = []
+    skipped = 0
+
+    for page in iter_pages(repo_root):
+        key = page.relative_to(repo_root).as_posix()
+        data = page.read_bytes()
+        page_hash = sha256_bytes(data)
+
+        entry = cache.get(key)
+        if entry and entry["page_sha256"] == page_hash and entry["inputs_sha256"] == css_hash:
+            new_cache[key] = entry
+            skipped += 1
+            for href in entry.get("missing_stylesheets", []):
+                warnings.append(f"{key}: linked stylesheet not found: {href}")
+            continue
+
+        text, encoding = decode_text(data)
+        new_text, critical_size, missing = inline_page(
+            text=text,
+            page=page,
+            repo_root=repo_root,
+            stylesheet=stylesheet,
+            rules=rules,
+            shared_tokens=shared_tokens,
+        )
+
+        for href in missing:
+            warnings.append(f"{key}: linked stylesheet not found: {href}")
+
+        output = encode_text(new_text, encoding) if new_text != text else data
+        if critical_size:
+            per_page[key] = critical_size
+        if not args.dry_run:
+            if output != data:
+                page.write_bytes(output)
+            new_cache[key] = {
+                "page_sha256": sha256_bytes(output),
+                "inputs_sha256": css_hash,
+                "missing_stylesheets": missing,
+            }
+
+    if args.dry_run:
+        print("DRY RUN: no files written.\n")
+    else:
+        save_cache(cache_path, new_cache)
+
+    if per_page:
+        print(f"Critical CSS per page (full stylesheet: {len(css_bytes):,} bytes):")
+        for key in sorted(per_page, key=str.lower):
+            print(f"  {key}: {per_page[key]:,} bytes")
+        print()
+
+    print(f"Pages processed: {len(per_page)}")
+    print(f"Pages unchanged since last run: {skipped}")
+
+    if warnings:
+        print("\nWarnings:")
+        for warning in warnings:
+            print(f"  {warning}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
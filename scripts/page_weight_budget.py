@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from retarget_images_to_webp import SKIP_DIR_NAMES, decode_text, find_repo_root
+
+
+CACHE_FILENAME = ".page-weight-cache.json"
+CACHE_VERSION = 4
+
+DEFAULT_MAX_TOTAL_BYTES = 2_000_000
+DEFAULT_MAX_CRITICAL_BYTES = 100_000
+
+DEFAULT_BUDGET_FILE = Path(__file__).with_name("page-weight-budget.json")
+
+# Directories that hold pages which are never published.
+SKIP_PAGE_DIR_NAMES = SKIP_DIR_NAMES | {"unused", "partials", "attached_assets"}
+
+FONT_EXTS = {".woff", ".woff2", ".ttf", ".otf", ".eot"}
+IMAGE_EXTS = {".webp", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".ico", ".avif"}
+
+CSS_URL_RE = re.compile(r"url\(\s*(?P<q>['\"]?)(?P<url>[^'\"\)]+)(?P=q)\s*\)", re.IGNORECASE)
+CSS_IMPORT_RE = re.compile(
+    r"@import\s+(?:url\(\s*)?['\"]?(?P<url>[^'\"\)\s;]+)['\"]?\s*\)?[^;]*;",
+    re.IGNORECASE,
+)
+CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+
+# Asset paths mentioned in script source, e.g. fetch('/assets/data/version.json')
+# or the header markup inject-header.js fetches from /partials/header.html.
+SCRIPT_ASSET_RE = re.compile(
+    r"(?P<url>(?:\.\./|\./|/)?assets/[^\"'`\s\?#<>\)\$]+"
+    r"\.(?:json|css|js|webp|png|jpe?g|gif|svg|ico|avif|woff2?|ttf|otf)"
+    r"|(?:\.\./|\./|/)?partials/[^\"'`\s\?#<>\)\$]+\.html)",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class Reference:
+    kind: str
+    url: str
+    blocking: bool
+    # Paths found in script text are fetched relative to the page at runtime
+    # but are usually written root-relative, so they may fall back to the root.
+    from_script: bool = False
+
+
+@dataclass(frozen=True)
+class ResolvedResource:
+    kind: str
+    rel_path: str
+    size: int
+    blocking: bool
+
+
+@dataclass(frozen=True)
+class Budget:
+    max_total_bytes: int
+    max_critical_bytes: int
+
+
+@dataclass
+class PageReport:
+    page: str
+    resources: list[ResolvedResource]
+    missing: list[str]
+    external: list[str]
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(r.size for r in self.resources)
+
+    @property
+    def critical_bytes(self) -> int:
+        return sum(r.size for r in self.resources if r.blocking)
+
+
+def kind_for_path(path: str) -> str:
+    suffix = Path(path).suffix.lower()
+    if suffix == ".css":
+        return "css"
+    if suffix in {".js", ".mjs"}:
+        return "js"
+    if suffix == ".json":
+        return "data"
+    if suffix == ".html":
+        return "html"
+    if suffix in FONT_EXTS:
+        return "font"
+    if suffix in IMAGE_EXTS:
+        return "image"
+    return "other"
+
+
+def is_external(url: str) -> bool:
+    lowered = url.lower()
+    return lowered.startswith(("http://", "https://", "//", "data:", "mailto:", "tel:", "javascript:"))
+
+
+def parse_srcset(value: str) -> list[str]:
+    urls: list[str] = []
+    for candidate in value.split(","):
+        parts = candidate.strip().split()
+        if parts:
+            urls.append(parts[0])
+    return urls
+
+
+class PageReferenceParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.references: list[Reference] = []
+        self._raw_tag: str | None = None
+        self._raw_chunks: list[str] = []
+        self._noscript_depth = 0
+
+    def _add(
+        self, kind: str, url: str | None, blocking: bool = False, from_script: bool = False
+    ) -> None:
+        # <noscript> fallbacks are not fetched by script-enabled browsers.
+        if url and not self._noscript_depth:
+            self.references.append(
+                Reference(kind=kind, url=url.strip(), blocking=blocking, from_script=from_script)
+            )
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        attr = {name: (value or "") for name, value in attrs}
+
+        if tag == "noscript":
+            self._noscript_depth += 1
+        elif tag == "link":
+            rel = attr.get("rel", "").lower().split()
+            href = attr.get("href")
+            if "stylesheet" in rel:
+                media = attr.get("media", "all").lower()
+                blocking = media in {"", "all", "screen"} and "onload" not in attr
+                self._add("css", href, blocking)
+            elif "icon" in rel or "apple-touch-icon" in rel:
+                self._add("image", href)
+            elif "preload" in rel or "modulepreload" in rel:
+                self._add(kind_for_path(urlsplit(href or "").path), href)
+        elif tag == "script":
+            src = attr.get("src")
+            if src:
+                script_type = attr.get("type", "").lower()
+                blocking = not (
+                    "async" in attr or "defer" in attr or script_type == "module"
+                )
+                self._add("js", src, blocking)
+            else:
+                self._raw_tag = "script"
+                self._raw_chunks = []
+        elif tag == "style":
+            self._raw_tag = "style"
+            self._raw_chunks = []
+        elif tag in {"img", "source"}:
+            self._add("image", attr.get("src"))
+            for url in parse_srcset(attr.get("srcset", "")):
+                self._add("image", url)
+        elif tag == "video":
+            self._add("image", attr.get("poster"))
+
+        style = attr.get("style")
+        if style:
+            for match in CSS_URL_RE.finditer(style):
+                url = match.group("url")
+                self._add(kind_for_path(urlsplit(url).path), url)
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.handle_starttag(tag, attrs)
+        if tag in {"script", "style"}:
+            self.handle_endtag(tag)
+
+    def handle_data(self, data: str) -> None:
+        if self._raw_tag is not None:
+            self._raw_chunks.append(data)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "noscript" and self._noscript_depth:
+            self._noscript_depth -= 1
+        if self._raw_tag != tag:
+            return
+        body = "".join(self._raw_chunks)
+        if tag == "script":
+            for url in scan_script_text(body):
+                self._add(kind_for_path(url), url, from_script=True)
+        else:
+            for ref in scan_css_text(body):
+                self.references.append(ref)
+        self._raw_tag = None
+        self._raw_chunks = []
+
+
+def scan_css_text(text: str) -> list[Reference]:
+    text = CSS_COMMENT_RE.sub("", text)
+    references: list[Reference] = []
+    imported: set[str] = set()
+    for match in CSS_IMPORT_RE.finditer(text):
+        url = match.group("url")
+        imported.add(url)
+        references.append(Reference(kind="css", url=url, blocking=True))
+    for match in CSS_URL_RE.finditer(text):
+        url = match.group("url").strip()
+        if url in imported:
+            continue
+        references.append(Reference(kind=kind_for_path(urlsplit(url).path), url=url, blocking=False))
+    return references
+
+
+def scan_script_text(text: str) -> list[str]:
+    return [match.group("url") for match in SCRIPT_ASSET_RE.finditer(text)]
+
+
+def scan_file(path: Path) -> list[Reference]:
+    text, _ = decode_text(path.read_bytes())
+    suffix = path.suffix.lower()
+    if suffix == ".css":
+        return scan_css_text(text)
+    if suffix in {".js", ".mjs"}:
+        return [
+            Reference(kind=kind_for_path(url), url=url, blocking=False, from_script=True)
+            for url in scan_script_text(text)
+        ]
+    parser = PageReferenceParser()
+    parser.feed(text)
+    parser.close()
+    return parser.references
+
+
+class ScanCache:
+    """Reference lists keyed by file path and content hash.
+
+    A file whose size and mtime are unchanged is not re-read at all; otherwise
+    it is re-hashed and only re-parsed when the hash differs.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if payload.get("version") == CACHE_VERSION:
+            self.entries = payload.get("files", {})
+
+    def references(self, file_path: Path, key: str) -> list[Reference]:
+        stat = file_path.stat()
+        entry = self.entries.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            self.hits += 1
+            return [Reference(*item) for item in entry["refs"]]
+
+        digest = hashlib.sha256(file_path.read_bytes()).hexdigest()
+        if entry and entry["sha256"] == digest:
+            refs = [Reference(*item) for item in entry["refs"]]
+            self.hits += 1
+        else:
+            refs = scan_file(file_path)
+            self.misses += 1
+
+        self.entries[key] = {
+            "sha256": digest,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "refs": [[r.kind, r.url, r.blocking, r.from_script] for r in refs],
+        }
+        self.dirty = True
+        return refs
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        payload = {"version": CACHE_VERSION, "files": self.entries}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+
+def resolve_local(url: str, base_dir: Path, repo_root: Path) -> Path:
+    path = unquote(urlsplit(url).path)
+    if path.startswith("/"):
+        return (repo_root / path.lstrip("/")).resolve()
+    return (base_dir / path).resolve()
+
+
+def iter_pages(root: Path) -> list[Path]:
+    pages: list[Path] = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_PAGE_DIR_NAMES]
+        for filename in filenames:
+            if filename.lower().endswith(".html"):
+                pages.append(Path(dirpath) / filename)
+    return sorted(pages, key=lambda p: str(p).lower())
+
+
+def analyze_page(page: Path, repo_root: Path, cache: ScanCache) -> PageReport:
+    resources: dict[Path, ResolvedResource] = {}
+    missing: set[str] = set()
+    external: set[str] = set()
+
+    page_key = page.relative_to(repo_root).as_posix()
+    # The document itself is always on the critical path, including any CSS
+    # or script inlined into it.
+    resources[page.resolve()] = ResolvedResource(
+        kind="html",
+        rel_path=page_key,
+        size=page.stat().st_size,
+        blocking=True,
+    )
+    pending: list[tuple[Reference, Path]] = [
+        (ref, page.parent) for ref in cache.references(page, page_key)
+    ]
+
+    while pending:
+        ref, base_dir = pending.pop()
+        if is_external(ref.url):
+            if not ref.url.lower().startswith(("data:", "mailto:", "tel:", "javascript:")):
+                external.add(ref.url)
+            continue
+
+        target = resolve_local(ref.url, base_dir, repo_root)
+        # Script-embedded paths are resolved against the page, but fall back
+        # to the site root since most of them are written root-relative.
+        # Markup and CSS references get no fallback: the browser won't either.
+        if not target.is_file() and ref.from_script and not ref.url.startswith(("/", ".")):
+            target = resolve_local("/" + ref.url, base_dir, repo_root)
+        if not target.is_file():
+            missing.add(ref.url)
+            continue
+
+        try:
+            rel_path = target.relative_to(repo_root).as_posix()
+        except ValueError:
+            missing.add(ref.url)
+            continue
+
+        existing = resources.get(target)
+        if existing is not None:
+            if ref.blocking and not existing.blocking:
+                resources[target] = ResolvedResource(existing.kind, rel_path, existing.size, True)
+            continue
+
+        resources[target] = ResolvedResource(
+            kind=ref.kind,
+            rel_path=rel_path,
+            size=target.stat().st_size,
+            blocking=ref.blocking,
+        )
+
+        if ref.kind == "css":
+            # Resources pulled in by a stylesheet resolve against the stylesheet;
+            # @import of a blocking sheet is itself blocking.
+            for child in cache.references(target, rel_path):
+                blocking = child.blocking and ref.blocking
+                pending.append((Reference(child.kind, child.url, blocking), target.parent))
+        elif ref.kind == "js":
+            for child in cache.references(target, rel_path):
+                pending.append((child, page.parent))
+
+    return PageReport(
+        page=page_key,
+        resources=sorted(resources.values(), key=lambda r: r.rel_path.lower()),
+        missing=sorted(missing),
+        external=sorted(external),
+    )
+
+
+def load_budgets(
+    path: Path, default: Budget, overrides: dict[str, int] | None = None
+) -> tuple[Budget, dict[str, Budget]]:
+    """Read the default budget and per-page overrides from a JSON file.
+
+    Keys are ``max_total_bytes`` / ``max_critical_bytes``; page entries only
+    need the limits they change and inherit the rest from the default.
+    ``overrides`` (from the command line) replace the file's default before
+    page entries are merged onto it. A missing file means the default
+    everywhere.
+    """
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        payload = {}
+
+    def merge(base: Budget, entry: dict) -> Budget:
+        return Budget(
+            max_total_bytes=int(entry.get("max_total_bytes", base.max_total_bytes)),
+            max_critical_bytes=int(entry.get("max_critical_bytes", base.max_critical_bytes)),
+        )
+
+    base = merge(merge(default, payload.get("default", {})), overrides or {})
+    pages = {page: merge(base, entry) for page, entry in payload.get("pages", {}).items()}
+    return base, pages
+
+
+def format_bytes(size: int) -> str:
+    if size >= 1_000_000:
+        return f"{size / 1_000_000:.2f} MB"
+    if size >= 1_000:
+        return f"{size / 1_000:.1f} kB"
+    return f"{size} B"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Resolve each page's CSS, JS, images, fonts and assets/data JSON to on-disk "
+            "sizes, report total and render-blocking (critical-path) bytes per page, and "
+            "fail when a budget is exceeded."
+        )
+    )
+    parser.add_argument(
+        "--budget-file",
+        type=Path,
+        default=DEFAULT_BUDGET_FILE,
+        help=(
+            "JSON file with the default budget and per-page overrides "
+            f"(default: scripts/{DEFAULT_BUDGET_FILE.name})."
+        ),
+    )
+    parser.add_argument(
+        "--max-total-bytes",
+        type=int,
+        help=(
+            "Default per-page budget for all local resources, overriding the budget "
+            f"file (built-in default: {DEFAULT_MAX_TOTAL_BYTES})."
+        ),
+    )
+    parser.add_argument(
+        "--max-critical-bytes",
+        type=int,
+        help=(
+            "Default per-page budget for render-blocking resources, overriding the "
+            f"budget file (built-in default: {DEFAULT_MAX_CRITICAL_BYTES})."
+        ),
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="List every resolved resource under each page.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Ignore and do not update {CACHE_FILENAME}.",
+    )
+    args = parser.parse_args(argv)
+
+    repo_root = find_repo_root(Path(__file__).parent)
+    cli_overrides = {
+        key: value
+        for key, value in (
+            ("max_total_bytes", args.max_total_bytes),
+            ("max_critical_bytes", args.max_critical_bytes),
+        )
+        if value is not None
+    }
+    try:
+        default_budget, page_budgets = load_budgets(
+            args.budget_file,
+            Budget(DEFAULT_MAX_TOTAL_BYTES, DEFAULT_MAX_CRITICAL_BYTES),
+            cli_overrides,
+        )
+    except (OSError, ValueError, AttributeError, TypeError) as exc:
+        print(f"Invalid budget file {args.budget_file}: {exc}")
+        return 2
+
+    cache = ScanCache(repo_root / CACHE_FILENAME)
+    if args.no_cache:
+        cache.entries = {}
+
+    reports = [analyze_page(page, repo_root, cache) for page in iter_pages(repo_root)]
+
+    if not args.no_cache:
+        cache.save()
+
+    over_budget: list[tuple[PageReport, str]] = []
+    print(f"{'Page':<32} {'Total':>10} {'Critical':>10}  Files")
+    for report in reports:
+        print(
+            f"{report.page:<32} {format_bytes(report.total_bytes):>10} "
+            f"{format_bytes(report.critical_bytes):>10}  {len(report.resources)}"
+        )
+        if args.verbose:
+            for resource in report.resources:
+                flag = " [blocking]" if resource.blocking else ""
+                print(f"    {resource.kind:<6} {format_bytes(resource.size):>10}  {resource.rel_path}{flag}")
+            for url in report.missing:
+                print(f"    missing           {url}")
+            for url in report.external:
+                print(f"    external          {url}")
+
+        budget = page_budgets.get(report.page, default_budget)
+        if report.total_bytes > budget.max_total_bytes:
+            over_budget.append(
+                (report, f"total {report.total_bytes:,} > {budget.max_total_bytes:,} bytes")
+            )
+        if report.critical_bytes > budget.max_critical_bytes:
+            over_budget.append(
+                (report, f"critical {report.critical_bytes:,} > {budget.max_critical_bytes:,} bytes")
+            )
+
+    missing_count = sum(len(r.missing) for r in reports)
+    if missing_count:
+        print(f"\nMissing local references: {missing_count} (run with --verbose for details)")
+
+    print(f"\nCache: {cache.hits} hit(s), {cache.misses} parse(s)")
+
+    if over_budget:
+        print("\nBudget exceeded:")
+        for report, reason in over_budget:
+            print(f"  {report.page}: {reason}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
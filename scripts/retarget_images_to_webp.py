@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import argparse
+import codecs
 import os
 import re
 from dataclasses import dataclass
@@ -46,7 +47,14 @@ def find_repo_root(start: Path) -> Path:
 
 
 def decode_text(data: bytes) -> tuple[str, str]:
-    for encoding in ("utf-8-sig", "utf-8", "cp1252", "latin-1"):
+    # utf-8-sig also decodes BOM-less input, so only report it when a BOM is
+    # present; otherwise re-encoding would add one.
+    if data.startswith(codecs.BOM_UTF8):
+        try:
+            return data.decode("utf-8-sig"), "utf-8-sig"
+        except UnicodeDecodeError:
+            pass
+    for encoding in ("utf-8", "cp1252", "latin-1"):
         try:
             return data.decode(encoding), encoding
         except UnicodeDecodeError:
@@ -71,39 +79,6 @@ def iter_target_files(root: Path) -> list[Path]:
     return targets
 
 
-def retarget_text(
-    text: str,
-    file_path: Path,
-    repo_root: Path,
-    missing: set[MatchInfo],
-) -> tuple[str, int]:
-    replacements = 0
-
-    def repl(match: re.Match[str]) -> str:
-        nonlocal replacements
-        prefix = match.group("prefix") or ""
-        name = match.group("name")
-        query = match.group("query") or ""
-
-        expected_rel = f"assets/images/web/{name}.webp"
-        expected_fs = repo_root / expected_rel
-        original_reference = f"{prefix}{match.group('path')}{query}"
-        if not expected_fs.exists():
-            missing.add(
-                MatchInfo(
-                    file_path=file_path,
-                    original_reference=original_reference,
-                    expected_webp=expected_rel,
-                )
-            )
-
-        replacements += 1
-        return f"{prefix}{expected_rel}{query}"
-
-    new_text = REFERENCE_RE.sub(repl, text)
-    return new_text, replacements
-
-
 def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(
         description=(
@@ -119,23 +94,24 @@ def main(argv: list[str] | None = None) -> int:
     )
     args = parser.parse_args(argv)
 
+    # The rewrite itself is the built-in "webp" rule of the rewrite engine;
+    # imported here because rewrite_rules imports this module's helpers.
+    from rewrite_rules import RuleSet, webp_rule, write_atomic
+
     repo_root = find_repo_root(Path(__file__).parent)
     targets = iter_target_files(repo_root)
 
     per_file_counts: dict[Path, int] = {}
     total_replacements = 0
     missing: set[MatchInfo] = set()
+    rule_set = RuleSet([webp_rule(repo_root, missing)])
 
     for path in targets:
         data = path.read_bytes()
         text, encoding = decode_text(data)
 
-        new_text, replacements = retarget_text(
-            text=text,
-            file_path=path,
-            repo_root=repo_root,
-            missing=missing,
-        )
+        new_text, counts = rule_set.apply(text, path)
+        replacements = sum(counts.values())
         if replacements <= 0:
             continue
 
@@ -143,7 +119,7 @@ def main(argv: list[str] | None = None) -> int:
         total_replacements += replacements
 
         if not args.dry_run and new_text != text:
-            path.write_bytes(encode_text(new_text, encoding))
+            write_atomic(path, encode_text(new_text, encoding))
 
     if args.dry_run:
         print("DRY RUN: no files written.\n")
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import difflib
+import json
+import os
+import re
+import string
+import sys
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from retarget_images_to_webp import (
+    REFERENCE_RE,
+    MatchInfo,
+    decode_text,
+    encode_text,
+    find_repo_root,
+    iter_target_files,
+)
+
+
+GROUP_DEF_RE = re.compile(r"\(\?P<(?P<name>[A-Za-z_]\w*)>")
+GROUP_REF_RE = re.compile(r"\(\?P=(?P<name>[A-Za-z_]\w*)\)")
+GROUP_COND_RE = re.compile(r"\(\?\((?P<name>[A-Za-z_]\w*)\)")
+LEADING_FLAGS_RE = re.compile(r"^\(\?(?P<flags>[a-zA-Z]+)\)")
+RULE_NAME_RE = re.compile(r"^[A-Za-z_]\w*$")
+
+FLAG_CHARS = {
+    re.IGNORECASE: "i",
+    re.MULTILINE: "m",
+    re.DOTALL: "s",
+    re.VERBOSE: "x",
+}
+
+Replacement = Callable[[dict[str, str], Path], str]
+
+
+@dataclass(frozen=True)
+class RewriteRule:
+    """One declarative rewrite: a regex and what each match becomes.
+
+    ``replacement`` is either a ``str.format`` template over the pattern's
+    named groups (unmatched groups format as ``""``) or a callable taking the
+    group dict and the file being rewritten. Patterns must use named groups:
+    numbered backreferences (``\\1``) and numbered conditionals (``(?(1)...)``)
+    do not survive being combined with other rules. A leading global flag
+    group such as ``(?i)`` is folded into ``flags``.
+    """
+
+    name: str
+    pattern: str
+    replacement: str | Replacement
+    flags: int = 0
+
+    def expand(self, groups: dict[str, str], file_path: Path) -> str:
+        if callable(self.replacement):
+            return self.replacement(groups, file_path)
+        return self.replacement.format(**groups)
+
+
+class RuleSet:
+    """Rewrite rules compiled into a single alternation.
+
+    Every rule becomes one ``(?P<__rN>...)`` branch with its named groups
+    prefixed, so a file is scanned once no matter how many rules there are.
+    Where rules overlap, the earliest match in the text wins, and among
+    matches at the same position the rule listed first wins.
+    """
+
+    def __init__(self, rules: list[RewriteRule]) -> None:
+        if not rules:
+            raise ValueError("at least one rewrite rule is required")
+        names = [rule.name for rule in rules]
+        for name in names:
+            if not RULE_NAME_RE.match(name):
+                raise ValueError(f"invalid rule name: {name!r}")
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"duplicate rule names: {', '.join(duplicates)}")
+
+        self.rules = list(rules)
+        self._group_names: list[list[tuple[str, str]]] = []
+        branches: list[str] = []
+        for index, rule in enumerate(self.rules):
+            pattern, flags = split_leading_flags(rule)
+            compiled = re.compile(pattern, flags)
+            if compiled.match(""):
+                raise ValueError(f"rule {rule.name!r} matches the empty string")
+            check_numbered_references(rule, pattern, flags)
+            check_template(rule, set(compiled.groupindex))
+            prefix = f"__r{index}_"
+            pattern = GROUP_DEF_RE.sub(lambda m: f"(?P<{prefix}{m.group('name')}>", pattern)
+            pattern = GROUP_REF_RE.sub(lambda m: f"(?P={prefix}{m.group('name')})", pattern)
+            pattern = GROUP_COND_RE.sub(lambda m: f"(?({prefix}{m.group('name')})", pattern)
+            flag_chars = "".join(c for flag, c in FLAG_CHARS.items() if flags & flag)
+            if flag_chars:
+                # In verbose mode a trailing "# comment" runs to the end of the
+                # line, so the closing paren has to start a new one.
+                closing = "\n)" if flags & re.VERBOSE else ")"
+                pattern = f"(?{flag_chars}:{pattern}{closing}"
+            branches.append(f"(?P<__r{index}>{pattern})")
+            self._group_names.append(
+                [(f"{prefix}{name}", name) for name in compiled.groupindex]
+            )
+        self.regex = re.compile("|".join(branches))
+
+    def apply(self, text: str, file_path: Path) -> tuple[str, dict[str, int]]:
+        counts: dict[str, int] = {}
+
+        def repl(match: re.Match[str]) -> str:
+            if match.start() == match.end():
+                # Zero-width matches (e.g. a lookbehind with an optional body)
+                # would insert text between characters; leave them alone.
+                return ""
+            index = int(match.lastgroup[3:])
+            rule = self.rules[index]
+            groups = {
+                name: match.group(qualified) or ""
+                for qualified, name in self._group_names[index]
+            }
+            counts[rule.name] = counts.get(rule.name, 0) + 1
+            return rule.expand(groups, file_path)
+
+        return self.regex.sub(repl, text), counts
+
+
+def split_leading_flags(rule: RewriteRule) -> tuple[str, int]:
+    """Move a leading ``(?imsx)`` group into flags; it is illegal mid-alternation."""
+    flags = rule.flags
+    match = LEADING_FLAGS_RE.match(rule.pattern)
+    if not match:
+        return rule.pattern, flags
+    letters = {c: flag for flag, c in FLAG_CHARS.items()}
+    for char in match.group("flags"):
+        if char == "u":
+            continue
+        if char not in letters:
+            raise ValueError(f"rule {rule.name!r}: unsupported inline flag {char!r}")
+        flags |= letters[char]
+    return rule.pattern[match.end():], flags
+
+
+def iter_group_references(parsed: sre_parse.SubPattern) -> Iterator[int]:
+    """Group numbers of every backreference and conditional, in pattern order."""
+    for op, av in parsed:
+        if op is sre_parse.GROUPREF:
+            yield av
+        elif op is sre_parse.GROUPREF_EXISTS:
+            yield av[0]
+            yield from iter_nested_references(av[1:])
+        else:
+            yield from iter_nested_references(av)
+
+
+def iter_nested_references(value: object) -> Iterator[int]:
+    if isinstance(value, sre_parse.SubPattern):
+        yield from iter_group_references(value)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from iter_nested_references(item)
+
+
+def check_numbered_references(rule: RewriteRule, pattern: str, flags: int) -> None:
+    """Reject \\1-style references, which point at other rules once combined.
+
+    The pattern is parsed twice, the second time behind an extra leading
+    group: named references shift with it, numbered ones stay put.
+    """
+    plain = list(iter_group_references(sre_parse.parse(pattern, flags)))
+    shifted = list(iter_group_references(sre_parse.parse("()" + pattern, flags)))
+    for before, after in zip(plain, shifted):
+        if before == after:
+            raise ValueError(
+                f"rule {rule.name!r}: numbered group reference to group {before}; "
+                "use a named group and (?P=name) or (?(name)...) instead"
+            )
+
+
+def check_template(rule: RewriteRule, group_names: set[str]) -> None:
+    """Reject templates that would fail at format time, before any file is read."""
+    if callable(rule.replacement):
+        return
+    if not isinstance(rule.replacement, str):
+        raise ValueError(f"rule {rule.name!r}: replacement must be a string")
+    try:
+        fields = [field for _, field, _, _ in string.Formatter().parse(rule.replacement)]
+    except ValueError as exc:
+        raise ValueError(f"rule {rule.name!r}: bad replacement template: {exc}") from None
+    for field in fields:
+        if field is None:
+            continue
+        name = re.split(r"[.\[]", field, maxsplit=1)[0]
+        if name not in group_names:
+            raise ValueError(
+                f"rule {rule.name!r}: replacement uses {{{field}}} but the pattern "
+                f"has no group named {name!r}"
+            )
+    # Conversions, format specs (including nested {fields}) and attribute or
+    # index lookups only fail once formatted, so try it once with empty groups.
+    try:
+        rule.replacement.format(**{name: "" for name in group_names})
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError) as exc:
+        raise ValueError(
+            f"rule {rule.name!r}: bad replacement template {rule.replacement!r}: "
+            f"{type(exc).__name__}: {exc}"
+        ) from None
+
+
+def webp_rule(repo_root: Path, missing: set[MatchInfo]) -> RewriteRule:
+    """The jpg/png -> webp retarget from retarget_images_to_webp.py as a rule."""
+
+    def replace(groups: dict[str, str], file_path: Path) -> str:
+        expected_rel = f"assets/images/web/{groups['name']}.webp"
+        if not (repo_root / expected_rel).exists():
+            missing.add(
+                MatchInfo(
+                    file_path=file_path,
+                    original_reference=f"{groups['prefix']}{groups['path']}{groups['query']}",
+                    expected_webp=expected_rel,
+                )
+            )
+        return f"{groups['prefix']}{expected_rel}{groups['query']}"
+
+    return RewriteRule(
+        name="webp",
+        pattern=REFERENCE_RE.pattern,
+        replacement=replace,
+        flags=REFERENCE_RE.flags,
+    )
+
+
+def load_rules_file(path: Path) -> list[RewriteRule]:
+    """Read rules from JSON: a list of {"name", "pattern", "replacement", "flags"}.
+
+    ``flags`` is an optional string of regex flag letters, e.g. ``"i"``.
+    """
+    try:
+        entries = json.loads(path.read_text(encoding="utf-8"))
+    except ValueError as exc:
+        raise ValueError(f"{path}: invalid JSON: {exc}") from None
+    if not isinstance(entries, list):
+        raise ValueError(f"{path}: expected a list of rules")
+    rules: list[RewriteRule] = []
+    letters = {c: flag for flag, c in FLAG_CHARS.items()}
+    for position, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"{path}: rule #{position} is not an object")
+        missing_keys = [key for key in ("name", "pattern", "replacement") if key not in entry]
+        if missing_keys:
+            raise ValueError(f"{path}: rule #{position} is missing {', '.join(missing_keys)}")
+        flags = 0
+        for char in entry.get("flags", ""):
+            if char not in letters:
+                raise ValueError(f"{path}: unknown flag {char!r} in rule {entry['name']!r}")
+            flags |= letters[char]
+        rules.append(
+            RewriteRule(
+                name=entry["name"],
+                pattern=entry["pattern"],
+                replacement=entry["replacement"],
+                flags=flags,
+            )
+        )
+    return rules
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.chmod(tmp_name, path.stat().st_mode & 0o7777)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Apply many URL rewrite rules to .html, .css and .js files in one pass. "
+            "All rules are compiled into a single matcher, so each file is read and "
+            "scanned once regardless of how many rules are active."
+        )
+    )
+    parser.add_argument(
+        "--rules-file",
+        action="append",
+        default=[],
+        type=Path,
+        help="JSON file of additional rules (repeatable).",
+    )
+    parser.add_argument(
+        "--no-builtin",
+        action="store_true",
+        help="Only apply rules from --rules-file, not the built-in webp retarget.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Stream unified diffs of the changes but do not write any files.",
+    )
+    args = parser.parse_args(argv)
+
+    repo_root = find_repo_root(Path(__file__).parent)
+    missing: set[MatchInfo] = set()
+
+    rules: list[RewriteRule] = [] if args.no_builtin else [webp_rule(repo_root, missing)]
+    try:
+        for rules_path in args.rules_file:
+            rules.extend(load_rules_file(rules_path))
+        rule_set = RuleSet(rules)
+    except (OSError, TypeError, ValueError, re.error) as exc:
+        print(f"Invalid rules: {exc}", file=sys.stderr)
+        return 2
+
+    per_file_counts: dict[Path, int] = {}
+    per_rule_counts: dict[str, int] = {rule.name: 0 for rule in rules}
+
+    for path in iter_target_files(repo_root):
+        data = path.read_bytes()
+        text, encoding = decode_text(data)
+
+        new_text, counts = rule_set.apply(text, path)
+        if not counts:
+            continue
+
+        per_file_counts[path] = sum(counts.values())
+        for name, count in counts.items():
+            per_rule_counts[name] += count
+
+        if new_text == text:
+            continue
+        rel = path.relative_to(repo_root).as_posix()
+        if args.dry_run:
+            sys.stdout.writelines(
+                difflib.unified_diff(
+                    text.splitlines(keepends=True),
+                    new_text.splitlines(keepends=True),
+                    fromfile=f"a/{rel}",
+                    tofile=f"b/{rel}",
+                )
+            )
+            sys.stdout.flush()
+        else:
+            write_atomic(path, encode_text(new_text, encoding))
+
+    if args.dry_run:
+        print("\nDRY RUN: no files written.")
+
+    print()
+    if per_file_counts:
+        print("Replacements per file:")
+        for path in sorted(per_file_counts, key=lambda p: str(p).lower()):
+            rel = path.relative_to(repo_root)
+            print(f"  {rel}: {per_file_counts[path]}")
+        print()
+
+    print("Replacements per rule:")
+    for name, count in per_rule_counts.items():
+        print(f"  {name}: {count}")
+    print(f"\nTotal replacements: {sum(per_rule_counts.values())}")
+
+    if missing:
+        print("\nMissing expected WebP files (reference found, but file does not exist):")
+        for item in sorted(
+            missing,
+            key=lambda m: (str(m.file_path).lower(), m.original_reference.lower()),
+        ):
+            rel_file = item.file_path.relative_to(repo_root)
+            print(f"  {rel_file}: {item.original_reference} -> {item.expected_webp}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())